@@ -5,6 +5,7 @@
 
 from collections import OrderedDict
 import concurrent.futures as cf
+from functools import partial
 import io
 import json
 import logging
@@ -18,6 +19,11 @@ from cc_corpus.io import BatchWriterBase
 from cc_corpus.utils import openall
 
 
+# Corpus files are read sequentially, from start to end; a large buffer
+# means fewer read() calls.
+READ_BUFFER_SIZE = 4 * 1024 * 1024
+
+
 class ParseError(Exception):
     """Raised if the file or stream is not in the corpus XML format."""
     pass
@@ -51,15 +57,15 @@ class Document:
             if not (p or w or c):
                 return (
                     len(ps),
-                    sum(len(p.split()) for p in ps),
-                    sum(len(p) for p in ps) + len(ps) - 1
+                    len(self.content().split()),
+                    sum(map(len, ps)) + len(ps) - 1
                 )
             elif p:
                 return len(ps)
             elif w:
-                return sum(len(p.split()) for p in ps)
+                return len(self.content().split())
             else:
-                return sum(len(p) for p in ps) + len(ps) - 1
+                return sum(map(len, ps)) + len(ps) - 1
         else:
             return 0 if p or w or c else (0, 0, 0)
 
@@ -76,7 +82,7 @@ class Document:
         The length (in characters) of the document. Same as len(self.content()).
         """
         if self.paragraphs:
-            return sum(len(p) for p in self.paragraphs) + len(self.paragraphs) - 1
+            return sum(map(len, self.paragraphs)) + len(self.paragraphs) - 1
         else:
             return 0
 
@@ -158,9 +164,14 @@ class SAXParser:
         self.handler = handler
         self.attrs = attrs
 
-    def parseFile(self, filename):
-        """Parses a file in corpus format. Calls parse() behind the scenes."""
-        with openall(filename, 'rt') as inf:
+    def parseFile(self, filename, sequential=False):
+        """
+        Parses a file in corpus format. Calls parse() behind the scenes.
+        If _sequential_ is True, the file is opened with
+        ``openall(sequential=True)``.
+        """
+        with openall(filename, 'rt', buffering=READ_BUFFER_SIZE,
+                     sequential=sequential) as inf:
             self.parse(inf, filename)
 
     def parse(self, corpus_stream, filename=None):
@@ -299,16 +310,17 @@ def _parse_docs(input, parse_fn, attrs=True, meta=True, content=True, **meta_fie
         return future.result()
 
 
-def _parse_jsonl(file: Path):
+def _parse_jsonl(file: Path, sequential: bool = False):
     """
-    Reads a jsonl file into our internal data format.
+    Reads a jsonl file into our internal data format. If _sequential_ is True,
+    the file is opened with ``openall(sequential=True)``.
     The JSONL contains less metadata than the original docs.
     Only the tags in the original <doc> tag are kept. This becomes the 'attrs'
     field of the Document object. The request and response content from the
     original docs, which would be the 'http_meta' field of the Document object,
     have been discarded.
     """
-    with openall(file) as f:
+    with openall(file, buffering=READ_BUFFER_SIZE, sequential=sequential) as f:
         for line in f:
             json_object = json.loads(line)
             yield Document(
@@ -340,15 +352,21 @@ def is_it_jsonl(filename: Path):
     return '.jsonl' in Path(filename).suffixes
 
 
-def parse_file(corpus_file, attrs=True, meta=True, content=True, **meta_fields):
+def parse_file(corpus_file, attrs=True, meta=True, content=True,
+               sequential=False, **meta_fields):
     """
     Enumerates Documents in a text file in the corpus or jsonl format.
-    The arguments behave the same as in parse().
+    The arguments behave the same as in parse(). If _sequential_ is True, the
+    file is read via :class:`cc_corpus.utils.SequentialFileIO`, which drops
+    its pages from the page cache when it is closed; only use it for files
+    that are read once.
     """
     if is_it_jsonl(corpus_file):
-        yield from _parse_jsonl(corpus_file)
+        yield from _parse_jsonl(corpus_file, sequential)
     else:
-        yield from _parse_docs(corpus_file, SAXParser.parseFile,
+        yield from _parse_docs(corpus_file,
+                               partial(SAXParser.parseFile,
+                                       sequential=sequential),
                                attrs, meta, content, **meta_fields)
 
 
@@ -33,6 +33,7 @@ def openall(
     filename: Union[Path, str], mode='rt', encoding=None, errors=None,
     newline=None, buffering=-1, closefd=True, opener=None,  # for open()
     compresslevel=5,  # faster default compression
+    sequential=False,
 ):
     """
     Opens all file types known to the Python SL. There are some differences
@@ -40,8 +41,17 @@ def openall(
     - the default mode is 'rt'
     - the default compresslevel is 5, because e.g. gzip does not benefit a lot
       from higher values, only becomes slower.
+    - when reading a gzip or bz2 file, a buffering larger than 1 is applied
+      to the underlying (compressed) file.
+    - if _sequential_ is ``True`` and the file is opened for reading, it is
+      read via :class:`SequentialFileIO` (except for dictzip files, if idzip
+      is installed).
     """
     filename = str(filename)
+    # The decompressors read the underlying file in small chunks, so if a
+    # larger buffer was asked for, we open that file ourselves
+    reading = mode.startswith('r') and '+' not in mode
+    own_file = reading and (buffering > 1 or sequential)
     if filename.endswith('.dz') and idzip:
         # Unfortunately idzip's API is not very good
         f = idzip.open(filename, mode.replace('t', '').replace('b', '') + 'b')
@@ -52,16 +62,101 @@ def openall(
             return f
     elif filename.endswith('.gz') or filename.endswith('.dz'):
         # .dz is .gz, so if we don't have idzip installed, we can still read it
+        if own_file:
+            f = _GzipFile(_open_binary(filename, buffering, sequential))
+            return io.TextIOWrapper(f, encoding, errors, newline) \
+                if 't' in mode else f
         return gzip.open(filename, mode, compresslevel,
                          encoding, errors, newline)
     elif filename.endswith('.bz2'):
+        if own_file:
+            f = _BZ2File(_open_binary(filename, buffering, sequential))
+            return io.TextIOWrapper(f, encoding, errors, newline) \
+                if 't' in mode else f
         return bz2.open(filename, mode, compresslevel,
                         encoding, errors, newline)
+    elif sequential and reading:
+        f = open_sequential(filename, buffering)
+        return io.TextIOWrapper(f, encoding, errors, newline) \
+            if 'b' not in mode else f
     else:
         return open(filename, mode, buffering, encoding, errors, newline,
                     closefd, opener)
 
 
+def _open_binary(filename: str, buffering: int, sequential: bool):
+    """Opens the file under a decompressing reader in :func:`openall`."""
+    if sequential:
+        return open_sequential(filename, buffering)
+    else:
+        return open(filename, 'rb', buffering)
+
+
+class _ClosesFileobj:
+    """
+    Mixin for :class:`gzip.GzipFile` and :class:`bz2.BZ2File`. These do not
+    close the file object they were given; this mixin makes them do so.
+    """
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._raw.close()
+
+
+class _GzipFile(_ClosesFileobj, gzip.GzipFile):
+    """A :class:`gzip.GzipFile` that reads (and owns) _fileobj_."""
+    def __init__(self, fileobj):
+        self._raw = fileobj
+        super().__init__(fileobj=fileobj, mode='rb')
+
+
+class _BZ2File(_ClosesFileobj, bz2.BZ2File):
+    """A :class:`bz2.BZ2File` that reads (and owns) _fileobj_."""
+    def __init__(self, fileobj):
+        self._raw = fileobj
+        super().__init__(fileobj, 'rb')
+
+
+class SequentialFileIO(io.FileIO):
+    """
+    A read-only :class:`io.FileIO` for files that are read once, from start
+    to end. Where posix_fadvise() is available, it tells the kernel that
+    reads through this descriptor are sequential (so it reads ahead more),
+    and that the pages of the file are not needed after it is closed, so
+    that they do not evict more useful ones from the page cache.
+    """
+    def __init__(self, filename: Union[Path, str]):
+        super().__init__(filename, 'r')
+        # The advice is only a hint, so errors (e.g. ESPIPE for pipes and
+        # FIFOs) are ignored
+        if hasattr(os, 'posix_fadvise'):
+            try:
+                os.posix_fadvise(self.fileno(), 0, 0,
+                                 os.POSIX_FADV_SEQUENTIAL)
+            except OSError:
+                pass
+
+    def close(self):
+        try:
+            if not self.closed and hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(self.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+        finally:
+            super().close()
+
+
+def open_sequential(filename: Union[Path, str], buffering=-1):
+    """
+    Opens _filename_ for reading in binary mode, via :class:`SequentialFileIO`.
+    _buffering_ is the size of the read buffer, as in :func:`open`.
+    """
+    if buffering <= 1:
+        buffering = io.DEFAULT_BUFFER_SIZE
+    return io.BufferedReader(SequentialFileIO(filename), buffering)
+
+
 def file_mode(f):
     """
     Returns the mode in which the file has been opened (with e.g. openall).
@@ -166,12 +261,40 @@ def collect_inputs(inputs: list[Path | str]) -> list[Path]:
         if input.is_file():
             files.append(input)
         elif input.is_dir():
-            files.extend(collect_inputs(list(input.iterdir())))
+            _collect_dir(input, files)
         else:
             raise ValueError(f'{input} is neither a file nor a directory')
     return files
 
 
+def _collect_dir(directory: Path, files: list[Path]):
+    """
+    Collects the files under _directory_ into _files_ for
+    :func:`collect_inputs`. Uses :func:`os.scandir`, whose entries already
+    know their type, so no extra ``stat()`` call is made per file.
+    """
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_file():
+                files.append(directory / entry.name)
+            elif entry.is_dir():
+                _collect_dir(directory / entry.name, files)
+            else:
+                raise ValueError(
+                    f'{entry.path} is neither a file nor a directory')
+
+
+def file_size(path: Union[Path, str]) -> int:
+    """
+    Returns the size of the file at _path_, or 0 if it cannot be determined.
+    Useful as a sort key to schedule the largest files first.
+    """
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
 def host_weight(value):
     """Implements an argument type for argparse that is a string:float tuple."""
     host, _, weight = value.partition(':')
@@ -20,6 +20,8 @@ time.
 import queue
 from argparse import ArgumentParser
 import boto3
+from botocore.config import Config
+from collections.abc import Generator, Iterable
 import gzip
 import hashlib
 import logging
@@ -30,12 +32,24 @@ from tempfile import gettempdir
 import threading
 import time
 from typing import Any, TextIO
-import zlib
+
+try:
+    # ISA-L's zlib implementation is much faster than the stdlib one
+    from isal import isal_zlib as zlib
+except ImportError:
+    import zlib
 
 from cc_corpus.download import download_warc_ranges, DownloadError
 from cc_corpus.utils import notempty, num_digits, openall, otqdm
 
 
+# Records in the same WARC file that are at most this many bytes apart are
+# downloaded in a single request...
+MAX_RANGE_GAP = 1024 * 1024
+# ... as long as the whole range is not longer than this
+MAX_RANGE_LENGTH = 16 * 1024 * 1024
+
+
 def parse_arguments():
     parser = ArgumentParser(
         description='CDX Index Batch Document Downloader')
@@ -153,54 +167,89 @@ def create_sorted_index(input_dir: Path, out_dir: Path) -> int:
     return retval
 
 
-def download_document(line: str,
-                      retries: int,
-                      outf: TextIO,
-                      doc_file: TextIO,
-                      errf: TextIO,
-                      session: Any) -> str:
+def group_ranges(lines: Iterable[str]) -> Generator[list[str]]:
     """
-    Downloads a single document based on a line from the index.
-    Returns True if successful, False if ran into an error.
+    Groups consecutive lines of the sorted index that point to the same WARC
+    file and lie close to each other (no more than :data:`MAX_RANGE_GAP` bytes
+    apart), so that they can be downloaded in a single request. The byte range
+    of a group never exceeds :data:`MAX_RANGE_LENGTH`, unless a single record
+    is longer than that.
+    """
+    group, warc, start, end = [], None, 0, 0
+    for line in lines:
+        fields = line.split()
+        offset, length = int(fields[3]), int(fields[4])
+        # A line before the start of the group (i.e. the index is not
+        # sorted) cannot be cut out of its range, so it starts a new one
+        if group and (
+            fields[2] != warc or offset < start or
+            offset - end > MAX_RANGE_GAP or
+            max(end, offset + length) - start > MAX_RANGE_LENGTH
+        ):
+            yield group
+            group = []
+        if not group:
+            warc, start, end = fields[2], offset, offset
+        group.append(line)
+        end = max(end, offset + length)
+    if group:
+        yield group
+
+
+def download_documents(lines: list[str],
+                       retries: int,
+                       errf: TextIO,
+                       session: Any) -> Generator[tuple[str, bytes]]:
+    """
+    Downloads the documents described by a group of lines from the index
+    (see :func:`group_ranges`). All documents are in the same WARC file, so
+    a single byte range that covers all of them is downloaded, and the
+    documents are cut out of it.
+
+    Yields the index line and the decompressed document for each document
+    that could be downloaded. Errors are logged; lines that could not be
+    downloaded are written to _errf_.
 
-    :param line: the description of the target as a line in the index.
+    :param lines: the description of the targets as lines in the index.
     :param retries: the number of retries left.
-    :param outf: the file where we write the sorted index.
-    :param doc_file: the file where we write the downloaded document itself.
     :param errf: the file where we write the download errors.
     :param session: the S3 connection session.
     """
-    line = line.strip().split()
-    warc = line[2]
-    # We never have more than one range here, because AWS does not
-    # support multirange requests. But for compatibility reasons
-    # we put the range into an array:
-    ranges = [(int(line[3]), int(line[4]))]
+    lines = [line.strip().split() for line in lines]
+    warc = lines[0][2]
+    ranges = [(int(line[3]), int(line[4])) for line in lines]
+    start = ranges[0][0]
+    end = max(offset + length for offset, length in ranges)
     try:
         st = time.time()
+        # AWS does not support multirange requests, so we download a single
+        # range that covers all documents
         downloaded = download_warc_ranges(warc,
-                                          ranges,
+                                          [(start, end - start)],
                                           retries,
                                           session=session)
-        logging.debug(f'Downloaded in {time.time() - st:.2f} seconds.')
+        logging.debug(f'Downloaded {len(lines)} documents in '
+                      f'{time.time() - st:.2f} seconds.')
+    except DownloadError as de:
+        logging.error(f'Could not download {warc}: {de}.')
+        for line in lines:
+            print(' '.join(line), file=errf)
+        return
 
+    for line, (offset, length) in zip(lines, ranges):
         index_str = ' '.join(line)
-        # Write it to the current index and data files:
         try:
-            decompressed = zlib.decompress(downloaded, zlib.MAX_WBITS | 32)
-            print(index_str, file=outf)
-            doc_file.write(decompressed)
+            decompressed = zlib.decompress(
+                downloaded[offset - start:offset - start + length],
+                zlib.MAX_WBITS | 32
+            )
         except zlib.error:
             logging.exception(
                 'Decompression error occured for '
                 f'`{index_str}.`'
             )
-            return False
-    except DownloadError as de:
-        logging.error(f'Could not download {warc}: {de}.')
-        print(' '.join(line), file=errf)
-        return False
-    return True
+            continue
+        yield index_str, decompressed
 
 
 def download_collected_ranges(ranges_dir: Path,
@@ -253,8 +302,8 @@ def download_collected_ranges(ranges_dir: Path,
     def worker(tid: str, session: Any):
         """
         A persistent daemon worker.
-        It consumes a single line from the queue, downloads it,
-        saves the contents to a file, then fetches another line.
+        It consumes a group of lines from the queue, downloads them,
+        saves the contents to a file, then fetches another group.
         Each worker has its own set of output files.
         """
 
@@ -265,10 +314,15 @@ def download_collected_ranges(ranges_dir: Path,
         chunk, written = 1, 0
         outf, doc_file = open_files(tid, chunk)
         while True:
-            line = q.get()
-            success = download_document(line, retries, outf, doc_file, errf,
-                                        session)
-            if success:
+            lines = q.get()
+            # Errors are logged by download_documents(); we only get the
+            # documents that were downloaded successfully
+            for index_str, document in download_documents(
+                lines, retries, errf, session
+            ):
+                # Write it to the current index and data files:
+                print(index_str, file=outf)
+                doc_file.write(document)
                 # Update counters, open new files if needed:
                 written += 1
                 if written == lines_per_file:
@@ -277,22 +331,23 @@ def download_collected_ranges(ranges_dir: Path,
                     chunk, written = chunk + 1, 0
                     outf, doc_file = open_files(tid, chunk)
                 progress_bar.update(1)
-            else:
-                # The errors are already logged by the download_document()
-                # method.
-                pass
             q.task_done()
         outf.close()
         doc_file.close()
 
     # We start the workers:
     thread_padding = f'{{:0{num_digits(num_threads)}}}'
+    # Adaptive retries back off on their own when S3 starts throttling us
+    # (503 Slow Down); keepalive keeps the connections to S3 open between
+    # requests.
+    s3_config = Config(retries={'max_attempts': 3, 'mode': 'adaptive'},
+                       tcp_keepalive=True)
     for i in range(num_threads):
         # We have to initialize the S3 sessions here
         # because if we try to initialize them inside the workers
         # launching many workers concurrently, boto3 produces random errors
         # in some of those threads.
-        session = boto3.client('s3')
+        session = boto3.client('s3', config=s3_config)
         thread = threading.Thread(target=worker,
                                   args=(thread_padding.format(i), session))
         thread.daemon = True
@@ -300,8 +355,8 @@ def download_collected_ranges(ranges_dir: Path,
 
     # We fill up the queue:
     with openall(ranges_file, 'rt') as inf:
-        for line in inf:
-            q.put(line)
+        for lines in group_ranges(inf):
+            q.put(lines)
 
     # This is to wait for all the threads to finish:
     q.join()
@@ -4,17 +4,27 @@
 """
 Sorts all entries in a list of index files.
 
-I am not sure how much the parallellism helps, as there is a "reduce" step
-at the end. Also, it would probably be faster to use the fact that the files
-are sorted after sort_one_file() and do a merge-sort.
+Each file is sorted in parallel by sort_one_file(); the sorted lists are then
+merged in a single pass in the main process.
 """
 
 from argparse import ArgumentParser
 import concurrent.futures as cf
-import gzip
-from itertools import chain
+import heapq
 import os
 import os.path as op
+import sys
+
+try:
+    # ISA-L's gzip implementation is much faster than the stdlib one
+    from isal import igzip as gzip
+except ImportError:
+    import gzip
+
+from cc_corpus.utils import open_sequential
+
+
+READ_BUFFER_SIZE = 1024 * 1024
 
 
 def parse_arguments():
@@ -32,22 +42,34 @@ def parse_arguments():
 
 
 def sort_one_file(file_name):
-    with gzip.open(file_name, 'rt') as inf:
-        # After filtering, the line is prepended with the "domain"
-        # I skip that and extract it myself; hence the [:7][-6:] part
-        to_sort = [(segment, int(offset), int(length))
-                   for segment, offset, length in
-                   (line.split()[:7][-6:][1:4] for line in map(str.strip, inf))]
+    # We only need ASCII fields, so no need to decode the file; and gzip reads
+    # in small chunks, hence the large buffer on the compressed file. If
+    # python-isal is installed, its igzip module is used for decompression.
+    with (open_sequential(file_name, READ_BUFFER_SIZE) as raw,
+          gzip.open(raw, 'rb') as inf):
+        to_sort = []
+        # The same few segments occur on many lines: keeping a single copy
+        # of each saves memory (pickle also sends it to main() only once),
+        # and comparing equal segments in sort() is just an identity check
+        segments = {}
+        for fields in map(bytes.split, inf):
+            # After filtering, the line is prepended with the "domain"
+            # I skip that and extract it myself; hence the two slices
+            segment, offset, length = (
+                fields[2:5] if len(fields) >= 7 else fields[1:4])
+            segment = segments.setdefault(segment, segment)
+            to_sort.append((segment, int(offset), int(length)))
         to_sort.sort()
-        return to_sort
+    return to_sort
 
 
 def main():
     args = parse_arguments()
     to_process = [op.join(args.input_dir, f) for f in os.listdir(args.input_dir)]
     with cf.ProcessPoolExecutor(max_workers=args.processes) as executor:
-        for segment, offset, length in sorted(chain(*executor.map(sort_one_file, to_process))):
-            print('{}\t{}\t{}'.format(segment, offset, length))
+        # Each list is sorted already, so a k-way merge is enough
+        merged = heapq.merge(*executor.map(sort_one_file, to_process))
+        sys.stdout.buffer.writelines(b'%s\t%d\t%d\n' % e for e in merged)
 
 
 if __name__ == '__main__':
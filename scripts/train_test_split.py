@@ -10,7 +10,9 @@ from pathlib import Path
 import random
 from typing import Optional
 
-from cc_corpus.utils import consume, openall, otqdm, notempty
+from cc_corpus.utils import (
+    consume, file_size, openall, otqdm, notempty
+)
 
 
 def parse_arguments():
@@ -44,20 +46,27 @@ def parse_arguments():
 def sample(input_file: Path, input_dir: Path, output_dir: Path,
            excluded_dir: Optional[Path], sample_rate: float):
     if excluded_dir:
-        excluded_file = notempty(openall(excluded_dir / input_file, 'wt'))
+        excluded_file = notempty(openall(excluded_dir / input_file, 'wb'))
     else:
-        excluded_file = open(os.devnull, 'wt')
+        excluded_file = open(os.devnull, 'wb')
+
+    # Lines are copied verbatim, so we can stay in bytes; comparing a random
+    # 32-bit integer to a threshold is also cheaper than random.random().
+    threshold = int(sample_rate * (1 << 32))
+    rng = random.getrandbits
 
     with (
-        openall(input_dir / input_file, 'rt') as inf,
-        notempty(openall(output_dir / input_file, 'wt')) as outf,
+        openall(input_dir / input_file, 'rb', sequential=True) as inf,
+        notempty(openall(output_dir / input_file, 'wb')) as outf,
         excluded_file as exclf
     ):
-        for line in map(str.strip, inf):
-            if random.random() < sample_rate:
-                print(line, file=outf)
+        out_write = outf.write
+        exc_write = exclf.write
+        for line in inf:
+            if rng(32) < threshold:
+                out_write(line)
             else:
-                print(line, file=exclf)
+                exc_write(line)
 
 
 def create_directories(base_dir: Path, relative_dirs: list[Path]):
@@ -95,6 +104,10 @@ def main():
             path.relative_to(args.input_dir)
         )
 
+    # Largest files first, so that no worker is left with a big one at the end
+    relative_files.sort(key=lambda f: file_size(args.input_dir / f),
+                        reverse=True)
+
     create_directories(args.output_dir, relative_dirs)
     create_directories(args.excluded_dir, relative_dirs)
 
@@ -12,11 +12,12 @@ import logging
 from multiprocessing import Pool
 import os
 
+from more_itertools import distribute
 from multiprocessing_logging import install_mp_handler
 import warc
 
-from cc_corpus.corpus import parse_file
-from cc_corpus.utils import collect_inputs, otqdm
+from cc_corpus.corpus import is_it_jsonl, parse_file, READ_BUFFER_SIZE
+from cc_corpus.utils import collect_inputs, file_size, openall, otqdm
 
 
 def parse_arguments():
@@ -59,48 +60,108 @@ def parse_arguments():
     return args
 
 
+def count_documents(filename):
+    """
+    Counts the documents in _filename_ without parsing them. In JSONL, each
+    line is a document; in the old corpus format, each ``</doc>`` line
+    closes one.
+    """
+    num_docs = 0
+    with openall(filename, 'rb', sequential=True) as inf:
+        if is_it_jsonl(filename):
+            last_chunk = b'\n'
+            for chunk in iter(partial(inf.read, READ_BUFFER_SIZE), b''):
+                num_docs += chunk.count(b'\n')
+                last_chunk = chunk
+            # The last line might not end with a newline
+            if not last_chunk.endswith(b'\n'):
+                num_docs += 1
+        else:
+            for line in inf:
+                if line.strip() == b'</doc>':
+                    num_docs += 1
+    return num_docs
+
+
 def count_file(filename, docs, ps, words, chars):
     """
     Counts the file denoted by filename. docs, ps, words and chars are bools
     telling the code whether to count the respective units.
     """
     # We need the content if we are counting anything aside from docs
-    logging.debug('Counting {}...'.format(filename))
+    logging.debug('Counting %s...', filename)
     need_content = ps or words or chars
+    need_text = words or chars
+    join = '\n'.join
     num_docs = num_ps = num_words = num_chars = 0
     try:
-        for doc in parse_file(filename, False, False, need_content):
-            num_docs += 1
-            if ps:
-                num_ps += doc.wc(p=True)
-            if words:
-                num_words += doc.wc(w=True)
-            if chars:
-                num_chars += doc.wc(c=True)
+        if not need_content:
+            num_docs = count_documents(filename)
+        else:
+            for doc in parse_file(filename, False, False, True,
+                                  sequential=True):
+                num_docs += 1
+                # Same numbers as Document.wc(), but the content is only
+                # joined once per document, and words / chars are counted
+                # on it in C.
+                if paragraphs := doc.paragraphs:
+                    num_ps += len(paragraphs)
+                    if need_text:
+                        content = join(paragraphs)
+                        if words:
+                            num_words += len(content.split())
+                        if chars:
+                            num_chars += len(content)
     except:
-        logging.exception('Error in file {}; read {} documents thus far.'.format(
-            filename, num_docs))
-    logging.debug('Counted {}.'.format(filename))
+        logging.exception('Error in file %s; read %d documents thus far.',
+                          filename, num_docs)
+    logging.debug('Counted %s.', filename)
     return num_docs, num_ps, num_words, num_chars
 
 
 def count_warc_file(filename, docs, ps, words, chars):
     """Same as count_file, but for WARC files."""
     # We need the content if we are counting anything aside from docs
-    logging.debug('Counting {}...'.format(filename))
+    logging.debug('Counting %s...', filename)
     num_docs = num_chars = 0
     try:
-        for doc in warc.open(filename):
-            num_docs += 1
-            if chars:
-                num_chars += doc.header.content_length
+        # openall() decompresses the file, so WARCFile need not
+        with openall(filename, 'rb', sequential=True) as inf:
+            for doc in warc.WARCFile(fileobj=inf):
+                num_docs += 1
+                if chars:
+                    num_chars += doc.header.content_length
     except:
-        logging.exception('Error in file {}; read {} documents thus far.'.format(
-            filename, num_docs))
-    logging.debug('Counted {}.'.format(filename))
+        logging.exception('Error in file %s; read %d documents thus far.',
+                          filename, num_docs)
+    logging.debug('Counted %s.', filename)
     return num_docs, 0, 0, num_chars
 
 
+# The counting function and its flags. Set once per worker process by
+# init_counter(), so that only the file names have to be sent with each task.
+count_fn = None
+count_flags = None
+
+
+def init_counter(fn, docs, ps, words, chars):
+    global count_fn, count_flags
+    count_fn = fn
+    count_flags = (docs, ps, words, chars)
+
+
+def count(filenames):
+    """
+    Counts all files in _filenames_ with the function set up by
+    init_counter(), and returns the sum of the numbers.
+    """
+    stats = [0, 0, 0, 0]
+    for filename in filenames:
+        for i, stat in enumerate(count_fn(filename, *count_flags)):
+            stats[i] += stat
+    return stats
+
+
 def tqdm_info(inputs):
     return ', '.join(inputs[:3]) + ('...' if len(inputs) >= 3 else '')
 
@@ -117,15 +178,25 @@ def main():
     os.nice(20)
 
     files = collect_inputs(args.inputs)
-    count_fn = count_file if not args.warc else count_warc_file
+    # Largest files first, so that no worker is left with a big one at the end
+    files.sort(key=file_size, reverse=True)
+    fn = count_file if not args.warc else count_warc_file
     logging.info('Scheduled {} files for counting...'.format(len(files)))
-    with Pool(args.processes) as p:
-        f = partial(count_fn, docs=args.documents, ps=args.paragraphs,
-                    words=args.words, chars=args.characters)
+    # There are only a few batches per worker, so each is given a fresh one
+    # to keep their memory usage in check
+    with Pool(args.processes, initializer=init_counter,
+              initargs=[fn, args.documents, args.paragraphs,
+                        args.words, args.characters],
+              maxtasksperchild=1) as p:
         stats = [0, 0, 0, 0]
-        tqdm_msg = f'Counting {tqdm_info(args.inputs)}'
-        for sub_stats in otqdm(p.imap_unordered(f, files),
-                               tqdm_msg, total=len(files)):
+        tqdm_msg = f'Counting {tqdm_info(args.inputs)} (batches)'
+        # Workers sum up the numbers for a whole batch of files. Files are
+        # dealt out round-robin, so the batches are of similar size and the
+        # ones submitted first still contain the largest files
+        batches = [batch for batch in map(
+            list, distribute(args.processes * 4, files)) if batch]
+        for sub_stats in otqdm(p.imap_unordered(count, batches),
+                               tqdm_msg, total=len(batches)):
             for i in range(len(stats)):
                 stats[i] += sub_stats[i]
 